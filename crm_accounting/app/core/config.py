@@ -9,10 +9,34 @@ class Settings:
     DB_DRIVER: str = os.getenv("DB_DRIVER", "ODBC Driver 17 for SQL Server")  # имя установленного драйвера
     TRUST_SERVER_CERTIFICATE: str = os.getenv("TRUST_SERVER_CERTIFICATE", "yes")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "crm_accounting")  # основная БД
+    # Режим разработки: шаблоны Jinja перечитываются с диска при изменении (DEBUG=1)
+    DEBUG: bool = os.getenv("DEBUG", "0") == "1"
+    # Проверка/создание таблиц при старте приложения (INIT_DB=1); иначе — python -m app.init_db
+    # (он же догоняет новые индексы во всех существующих клиентских БД)
+    INIT_DB: bool = os.getenv("INIT_DB", "0") == "1"
+
+    # Пул соединений основной БД
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 20))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    # Размер LRU-кэша скомпилированных SQL-выражений на engine (SQLAlchemy по умолчанию — 500)
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv("DB_QUERY_CACHE_SIZE", 1200))
+
+    # Пулы клиентских БД (по одному engine на БД, не больше CLIENT_DB_ENGINES_MAX)
+    CLIENT_DB_POOL_SIZE: int = int(os.getenv("CLIENT_DB_POOL_SIZE", 5))
+    CLIENT_DB_MAX_OVERFLOW: int = int(os.getenv("CLIENT_DB_MAX_OVERFLOW", 10))
+    CLIENT_DB_ENGINES_MAX: int = int(os.getenv("CLIENT_DB_ENGINES_MAX", 256))
+
+    # Потоки anyio для синхронных (def) обработчиков FastAPI; по умолчанию в anyio — 40
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", 100))
 
     # Секреты / JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+    # CORS: список внешних origin через запятую; пусто — middleware не подключается
+    CORS_ORIGINS: list[str] = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+
 settings = Settings()
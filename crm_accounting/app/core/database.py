@@ -1,5 +1,5 @@
 # app/core/database.py
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from urllib.parse import quote_plus
 import logging
@@ -35,7 +35,12 @@ def _build_main_mssql_url() -> str:
 MAIN_DB_URL = _build_main_mssql_url()
 _main_engine = create_engine(
     MAIN_DB_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
     pool_pre_ping=True,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
     future=True,
     fast_executemany=True
 )
@@ -47,6 +52,11 @@ SessionLocal = sessionmaker(
 )
 
 
+def dispose_main_engine() -> None:
+    """Закрывает пул соединений основной БД (остановка приложения)."""
+    _main_engine.dispose()
+
+
 def get_main_db():
     """
     Dependency для получения сессии основной БД в FastAPI.
@@ -60,12 +70,26 @@ def get_main_db():
 
 # ---------- optional: ensure tables (если где-то вызывается) ----------
 
+def create_missing_indexes(base_metadata, bind):
+    """
+    Создаёт индексы из metadata, которых ещё нет в БД.
+    create_all создаёт индексы только вместе с новой таблицей, поэтому для уже
+    существующих таблиц (основная и клиентские БД) индексы добавляются здесь.
+    """
+    for table in base_metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=bind, checkfirst=True)
+            except Exception as e:
+                logger.error(f"Не удалось создать индекс {index.name} для {table.name}: {e}")
+
+
 def check_and_create_tables(base_metadata=None):
     """
     Проверяет и создаёт таблицы основной БД, если они отсутствуют.
     """
     if base_metadata is None:
         base_metadata = Base.metadata
-    insp = inspect(_main_engine)
     base_metadata.create_all(_main_engine, checkfirst=True)
+    create_missing_indexes(base_metadata, _main_engine)
     logger.info("Проверка/создание таблиц основной БД завершена")
@@ -0,0 +1,46 @@
+# app/init_db.py
+"""
+Проверка/создание таблиц и индексов основной БД и догонка индексов
+в уже существующих клиентских БД вне процесса веб-сервера:
+
+    python -m app.init_db
+"""
+import logging
+
+from sqlalchemy import select
+
+from app.core.database import SessionLocal, check_and_create_tables, create_missing_indexes
+from app.managers.client_db_manager import client_db_manager
+from app.models.main_db import ClientOrganization
+from app.models.client_template import ClientBase
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def upgrade_client_databases() -> None:
+    """
+    Создаёт недостающие индексы ClientBase.metadata во всех клиентских БД.
+    Миграций в проекте нет, а create_client_database вызывается только при
+    (пере)создании БД, поэтому новые индексы до живых клиентов доходят отсюда.
+    """
+    with SessionLocal() as db:
+        names = db.scalars(
+            select(ClientOrganization.database_name)
+            .where(ClientOrganization.database_name.isnot(None), ClientOrganization.database_name != "")
+            .order_by(ClientOrganization.id)
+        ).all()
+
+    for name in names:
+        logger.info(f"Проверка индексов клиентской БД {name}")
+        try:
+            create_missing_indexes(ClientBase.metadata, client_db_manager.get_engine(name))
+        except Exception as e:
+            logger.error(f"Не удалось обновить индексы клиентской БД {name}: {e}")
+
+    client_db_manager.dispose_all()
+
+
+if __name__ == "__main__":
+    check_and_create_tables()
+    upgrade_client_databases()
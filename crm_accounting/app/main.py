@@ -1,11 +1,17 @@
 # app/main.py
 import logging
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
 
-from app.core.database import check_and_create_tables
+from app.core.config import settings
+from app.core.database import check_and_create_tables, dispose_main_engine
+from app.managers.client_db_manager import client_db_manager
 from app.routes import (
     auth,
     admin,
@@ -24,16 +30,53 @@ from app.utils import templates
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="CRM Accounting", version="2.0")
+# Шаблоны самых частых страниц компилируются при старте, а не на первом запросе
+PREWARM_TEMPLATES = (
+    "index.html",
+    "admin/dashboard.html",
+    "client/dashboard.html",
+    "client/clients.html",
+    "client/client_card.html",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Обработчики с БД синхронные и выполняются в пуле потоков anyio
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+    if settings.INIT_DB:
+        logger.info("🚀 Проверка таблиц БД...")
+        check_and_create_tables()
+
+    for name in PREWARM_TEMPLATES:
+        templates.get_template(name)
+
+    yield
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    client_db_manager.dispose_all()
+    dispose_main_engine()
+
+
+app = FastAPI(
+    title="CRM Accounting",
+    version="2.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
+# HTML-страницы и их fetch-запросы — same-origin, CORS нужен только внешним клиентам API
+if settings.CORS_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE"],
+        allow_headers=["authorization", "content-type"],
+    )
+
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # Роутеры
@@ -50,12 +93,6 @@ app.include_router(client_settings.router, tags=["client_settings"])
 app.include_router(client_organizations.router, tags=["client_organizations"])
 
 
-@app.on_event("startup")
-def startup_event():
-    logger.info("🚀 Проверка таблиц БД...")
-    check_and_create_tables()
-
-
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -69,4 +106,4 @@ async def admin_page(request: Request):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True, loop="auto", http="httptools")
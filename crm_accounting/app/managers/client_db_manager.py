@@ -1,12 +1,15 @@
 # app/managers/client_db_manager.py
 import logging
+import threading
+from collections import OrderedDict
 from urllib.parse import quote_plus
 
 import pyodbc
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, select, text
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.database import create_missing_indexes
 from app.models.client_template import ClientBase  # metadata клиентской БД
 # Важно: чтобы metadata знала все модели:
 from app.models.client_template import (  # noqa: F401
@@ -57,11 +60,34 @@ def _pyodbc_master_conn():
     return pyodbc.connect(conn_str, autocommit=True)
 
 
+def _create_client_engine(database_name: str):
+    return create_engine(
+        _build_client_url(database_name),
+        pool_size=settings.CLIENT_DB_POOL_SIZE,
+        max_overflow=settings.CLIENT_DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        future=True,
+        fast_executemany=True,
+    )
+
+
 class ClientDBManager:
     """
     Управление клиентскими БД: создание, подключение, сессии.
+    Engine (и его пул соединений) создаётся один раз на БД и переиспользуется;
+    при превышении лимита вытесняется давно не использованный engine.
     """
 
+    def __init__(self, max_engines: int = settings.CLIENT_DB_ENGINES_MAX):
+        self._max_engines = max_engines
+        self._engines: OrderedDict = OrderedDict()
+        self._sessionmakers: dict = {}
+        self._inner_client_ids: dict = {}
+        self._lock = threading.Lock()
+
     def create_client_database(self, client_org, database_name: str | None = None) -> str:
         """
         Создаёт БД клиента, если её нет, и накатывает структуру таблиц из ClientBase.metadata.
@@ -83,16 +109,14 @@ class ClientDBManager:
                 logger.info(f"БД {db_name} создана")
 
         # 2) Создание таблиц клиентской схемы
-        url = _build_client_url(db_name)
-        engine = create_engine(url, pool_pre_ping=True, future=True, fast_executemany=True)
+        engine = self.get_engine(db_name)
         ClientBase.metadata.create_all(bind=engine, checkfirst=True)
+        create_missing_indexes(ClientBase.metadata, engine)
         logger.info(f"Таблицы для БД {db_name} проверены/созданы")
 
         # 3) Опционально: начальные данные (например, CompanySettings по умолчанию)
-        SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
-        with SessionLocal() as s:
+        with self.get_client_session(db_name) as s:
             # если нет settings – создадим пустую запись
-            from sqlalchemy import select
             if s.execute(select(CompanySettings).limit(1)).first() is None:
                 s.add(CompanySettings(company_name=client_org.company_name or f"Клиент {client_org.id}"))
             # базовые справочники периодов – по желанию (оставлю пустым)
@@ -102,12 +126,62 @@ class ClientDBManager:
 
     # ---------- вспомогательные методы ----------
 
+    def _get_cached(self, database_name: str):
+        """Возвращает (engine, sessionmaker) для БД, создавая их при первом обращении."""
+        evicted = None
+        with self._lock:
+            engine = self._engines.get(database_name)
+            if engine is not None:
+                self._engines.move_to_end(database_name)
+                return engine, self._sessionmakers[database_name]
+
+            engine = _create_client_engine(database_name)
+            factory = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+            self._engines[database_name] = engine
+            self._sessionmakers[database_name] = factory
+            if len(self._engines) > self._max_engines:
+                evicted_name, evicted = self._engines.popitem(last=False)
+                self._sessionmakers.pop(evicted_name, None)
+                self._inner_client_ids.pop(evicted_name, None)
+
+        if evicted is not None:
+            evicted.dispose()
+        return engine, factory
+
     def get_engine(self, database_name: str):
-        return create_engine(_build_client_url(database_name), pool_pre_ping=True, future=True, fast_executemany=True)
+        return self._get_cached(database_name)[0]
 
     def get_client_session(self, database_name: str):
-        engine = self.get_engine(database_name)
-        return sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)()
+        return self._get_cached(database_name)[1]()
+
+    def inner_client_id(self, database_name: str) -> int | None:
+        """
+        id записи в таблице clients клиентской БД, к которой привязываются отчёты
+        (первая по id). Значение не меняется, поэтому кэшируется; отсутствие записи
+        не кэшируется — её могут создать позже.
+        """
+        with self._lock:
+            client_id = self._inner_client_ids.get(database_name)
+        if client_id is not None:
+            return client_id
+
+        with self.get_client_session(database_name) as session:
+            client_id = session.scalar(select(Client.id).order_by(Client.id).limit(1))
+
+        if client_id is not None:
+            with self._lock:
+                self._inner_client_ids[database_name] = client_id
+        return client_id
+
+    def dispose_all(self) -> None:
+        """Закрывает пулы всех кэшированных engine (остановка приложения)."""
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+            self._sessionmakers.clear()
+            self._inner_client_ids.clear()
+        for engine in engines:
+            engine.dispose()
 
 # singleton
 client_db_manager = ClientDBManager()
@@ -1,7 +1,6 @@
 # app/models/client_template.py
-from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Text
+    Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Text, Index, func, text
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -22,8 +21,8 @@ class ClientUser(ClientBase):
     profile_name = Column(String(255), nullable=True)
     hashed_password = Column(String(255), nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
 
     accesses = relationship(
         "ClientUserClientAccess",
@@ -49,8 +48,14 @@ class Client(ClientBase):
     tax_system = Column(String(100), nullable=False)
     is_employer = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
+
+    signatures = relationship(
+        "DigitalSignature",
+        back_populates="client",
+        order_by="DigitalSignature.id",
+    )
 
     def __repr__(self):
         return f"<Client(id={self.id}, organization_name='{self.organization_name}')>"
@@ -63,11 +68,11 @@ class ClientUserClientAccess(ClientBase):
     __tablename__ = "client_user_client_access"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("client_users.id", ondelete="CASCADE"), nullable=False)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("client_users.id", ondelete="CASCADE"), nullable=False, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
     can_view_calendar = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
 
     user = relationship("ClientUser", back_populates="accesses")
     client = relationship("Client")
@@ -86,16 +91,28 @@ class DigitalSignature(ClientBase):
     __tablename__ = "digital_signatures"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
     owner_name = Column(String(255), nullable=False)
     certificate_number = Column(String(255), nullable=True)
     start_date = Column(DateTime, nullable=True)
     end_date = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    client = relationship("Client")
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
+
+    client = relationship("Client", back_populates="signatures")
+
+    __table_args__ = (
+        Index("ix_digital_signatures_client_active", "client_id", mssql_where=text("is_active = 1")),
+        # Истекающие ЭЦП (дашборд и отдельная страница): диапазон по end_date,
+        # client_id/owner_name включены, чтобы не ходить в кластерный индекс
+        Index(
+            "ix_digital_signatures_end_date",
+            "end_date",
+            mssql_where=text("end_date IS NOT NULL"),
+            mssql_include=["client_id", "owner_name"],
+        ),
+    )
 
     def __repr__(self):
         return f"<DigitalSignature(id={self.id}, owner='{self.owner_name}', end_date={self.end_date})>"
@@ -116,8 +133,8 @@ class CompanySettings(ClientBase):
     report_email = Column(String(255), nullable=True)
     phone = Column(String(64), nullable=True)
     address = Column(String(512), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
 
     def __repr__(self):
         return f"<CompanySettings(company_name='{self.company_name}')>"
@@ -130,12 +147,12 @@ class ReportPeriod(ClientBase):
     __tablename__ = "report_periods"
 
     id = Column(Integer, primary_key=True, index=True)
-    report_id = Column(Integer, ForeignKey("report_templates.id", ondelete="CASCADE"), nullable=True)
+    report_id = Column(Integer, ForeignKey("report_templates.id", ondelete="CASCADE"), nullable=True, index=True)
     period = Column(String(50), nullable=False)
     year = Column(Integer, nullable=False)
     due_date = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
 
     report = relationship("ReportTemplate", back_populates="periods")
 
@@ -154,10 +171,15 @@ class ReportTemplate(ClientBase):
     full_name = Column(String(500), nullable=False)    # новое поле
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
 
     periods = relationship("ReportPeriod", back_populates="report", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Справочник доступных отчётов выбирает только активные шаблоны
+        Index("ix_report_templates_active", "id", mssql_where=text("is_active = 1")),
+    )
+
     def __repr__(self):
         return f"<ReportTemplate(id={self.id}, short_name='{self.short_name}')>"
 
@@ -169,11 +191,11 @@ class Report(ClientBase):
     __tablename__ = "reports"
 
     id = Column(Integer, primary_key=True, index=True)
-    template_id = Column(Integer, ForeignKey("report_templates.id"))
-    period_id = Column(Integer, ForeignKey("report_periods.id"), nullable=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
-    created_by = Column(Integer, ForeignKey("client_users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    template_id = Column(Integer, ForeignKey("report_templates.id"), index=True)
+    period_id = Column(Integer, ForeignKey("report_periods.id"), nullable=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
+    created_by = Column(Integer, ForeignKey("client_users.id"), index=True)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
     status = Column(String(64), nullable=True)
     file_path = Column(String(512), nullable=True)
 
@@ -193,14 +215,20 @@ class ClientReport(ClientBase):
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey('clients.id', ondelete="CASCADE"), nullable=False)
-    template_id = Column(Integer, ForeignKey('report_templates.id', ondelete="CASCADE"), nullable=False)
+    template_id = Column(Integer, ForeignKey('report_templates.id', ondelete="CASCADE"), nullable=False, index=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
 
     client = relationship("Client")
     template = relationship("ReportTemplate")
 
+    __table_args__ = (
+        Index("ix_client_reports_client_active", "client_id", "is_active"),
+        # Один шаблон закрепляется за клиентом один раз (assign_report опирается на это)
+        Index("uq_client_reports_client_template", "client_id", "template_id", unique=True),
+    )
+
     def __repr__(self):
         return f"<ClientReport(client_id={self.client_id}, template_id={self.template_id})>"
 
@@ -212,10 +240,10 @@ class ClientReportHistory(ClientBase):
     __tablename__ = "client_report_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_report_id = Column(Integer, ForeignKey('client_reports.id'))
+    client_report_id = Column(Integer, ForeignKey('client_reports.id'), index=True)
     start_date = Column(Date, nullable=False)
     end_date = Column(Date)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
 
     client_report = relationship("ClientReport", backref="history")
 
@@ -237,7 +265,7 @@ class CalendarHandbook(ClientBase):
     default_day = Column(Integer, nullable=True)
     default_month = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
 
     def __repr__(self):
         return f"<CalendarHandbook(id={self.id}, name='{self.name}')>"
@@ -253,13 +281,17 @@ class CalendarEvent(ClientBase):
     title = Column(String(255), nullable=False)
     date = Column(DateTime, nullable=False)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
-    handbook_id = Column(Integer, ForeignKey("calendar_handbook.id"), nullable=True)
+    handbook_id = Column(Integer, ForeignKey("calendar_handbook.id"), nullable=True, index=True)
     description = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
 
     client = relationship("Client")
     handbook = relationship("CalendarHandbook")
 
+    __table_args__ = (
+        Index("ix_calendar_events_client_date", "client_id", "date"),
+    )
+
     def __repr__(self):
         return f"<CalendarEvent(id={self.id}, title='{self.title}', date={self.date})>"
 
@@ -282,4 +314,4 @@ class Organization(ClientBase):
     bik = Column(String(9))
     payment_account = Column(String(20))
     correspondent_account = Column(String(20))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
@@ -1,7 +1,6 @@
 # app/models/main_db.py
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
-from datetime import datetime
 from app.core.database import Base
 
 class User(Base):
@@ -13,7 +12,7 @@ class User(Base):
     full_name = Column(String(255))
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
@@ -22,7 +21,7 @@ class UserProfile(Base):
     name = Column(String(50), unique=True, nullable=False)
     description = Column(Text)
     permissions = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
 
 class ClientOrganization(Base):
     __tablename__ = "client_organizations"
@@ -33,8 +32,8 @@ class ClientOrganization(Base):
     company_name = Column(String(255))
     notes = Column(Text)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
 
     # Устаревшие поля (оставляем для обратной совместимости)
     email = Column(String(255), nullable=True)
@@ -46,6 +45,15 @@ class ClientOrganization(Base):
     # Связь с пользователями
     users = relationship("ClientUser", back_populates="client_organization")
 
+    __table_args__ = (
+        # Фильтр по статусу БД в админке (has_db / no_db)
+        Index(
+            "ix_client_organizations_database_name",
+            "database_name",
+            mssql_where=database_name.isnot(None),
+        ),
+    )
+
     def to_dict(self):
         """Метод для преобразования объекта в словарь"""
         # Получаем основного пользователя (владельца)
@@ -72,7 +80,7 @@ class ClientUser(Base):
     __tablename__ = "client_users"
     
     id = Column(Integer, primary_key=True, index=True)
-    client_organization_id = Column(Integer, ForeignKey('client_organizations.id'), nullable=False)
+    client_organization_id = Column(Integer, ForeignKey('client_organizations.id'), nullable=False, index=True)
     email = Column(String(255), nullable=False)
     login = Column(String(100), nullable=False)
     hashed_password = Column(String(255), nullable=False)
@@ -80,8 +88,8 @@ class ClientUser(Base):
     phone = Column(String(50), nullable=True)
     profile_id = Column(Integer, ForeignKey('user_profiles.id'), nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime())
+    updated_at = Column(DateTime, default=func.sysutcdatetime(), server_default=func.sysutcdatetime(), onupdate=func.sysutcdatetime())
     
     # Связи
     client_organization = relationship("ClientOrganization", back_populates="users")
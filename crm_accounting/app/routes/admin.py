@@ -1,6 +1,7 @@
 # app/routes/admin.py
 from fastapi import APIRouter, Depends, HTTPException, Body, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import ORJSONResponse, HTMLResponse
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 import logging
 
@@ -9,6 +10,7 @@ from app.models.main_db import ClientOrganization, ClientUser
 from app.managers.client_db_manager import client_db_manager
 from app.services.user_service import UserService
 from app.utils import templates
+from app.utils.client_utils import invalidate_client_org
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -27,7 +29,7 @@ async def admin_dashboard(request: Request):
 # Список клиентов (JSON)
 # ------------------------------------------------------
 @router.get("/clients")
-async def list_clients(
+def list_clients(
     db: Session = Depends(get_main_db),
     query: str | None = None,
     status: str | None = None
@@ -36,42 +38,49 @@ async def list_clients(
     Возвращает список клиентов с e-mail, телефоном (из таблицы client_users) и статусом БД.
     """
     try:
-        q = db.query(ClientOrganization)
-        if query:
-            q = q.filter(ClientOrganization.company_name.ilike(f"%{query}%"))
-
-        orgs = q.order_by(ClientOrganization.id.desc()).all()
-        logger.info(f"📋 Загружено клиентов: {len(orgs)}")
-
-        result = []
-        for org in orgs:
-            has_db = bool(org.database_name)
-            if status == "has_db" and not has_db:
-                continue
-            if status == "no_db" and has_db:
-                continue
-
-            # Берем первого пользователя-«владельца» из client_users (основная БД)
-            client_user = (
-                db.query(ClientUser)
-                .filter(ClientUser.client_organization_id == org.id)
-                .order_by(ClientUser.id.asc())
-                .first()
+        # Владелец — первый пользователь организации (минимальный id в client_users).
+        # Один Core-запрос строками, без N+1 и без гидратации ORM-объектов.
+        owner = (
+            select(
+                ClientUser.client_organization_id.label("client_organization_id"),
+                func.min(ClientUser.id).label("user_id"),
             )
+            .group_by(ClientUser.client_organization_id)
+            .subquery()
+        )
 
-            email = getattr(client_user, "email", None) if client_user else None
-            phone = getattr(client_user, "phone", None) if client_user else None
+        stmt = (
+            select(
+                ClientOrganization.id,
+                ClientOrganization.company_name,
+                ClientOrganization.database_name,
+                ClientUser.email,
+                ClientUser.phone,
+            )
+            .outerjoin(owner, owner.c.client_organization_id == ClientOrganization.id)
+            .outerjoin(ClientUser, ClientUser.id == owner.c.user_id)
+        )
+        if query:
+            stmt = stmt.where(ClientOrganization.company_name.ilike(f"%{query}%"))
+        if status == "has_db":
+            stmt = stmt.where(ClientOrganization.database_name.isnot(None), ClientOrganization.database_name != "")
+        elif status == "no_db":
+            stmt = stmt.where(or_(ClientOrganization.database_name.is_(None), ClientOrganization.database_name == ""))
 
-            result.append({
-                "id": org.id,
-                "company_name": org.company_name or "—",
-                "email": email or "—",
-                "phone": phone or "—",
+        result = [
+            {
+                "id": row["id"],
+                "company_name": row["company_name"] or "—",
+                "email": row["email"] or "—",
+                "phone": row["phone"] or "—",
                 "profile_name": "Владелец",
-                "database_name": org.database_name or "Не создана",
+                "database_name": row["database_name"] or "Не создана",
                 "is_active": True,
-                "client_organization_id": org.id
-            })
+                "client_organization_id": row["id"],
+            }
+            for row in db.execute(stmt.order_by(ClientOrganization.id.desc())).mappings()
+        ]
+        logger.info(f"📋 Загружено клиентов: {len(result)}")
 
         return result
     except Exception as e:
@@ -83,13 +92,13 @@ async def list_clients(
 # ✅ Регистрация нового клиента (из формы на index.html)
 # ------------------------------------------------------
 @router.post("/clients")
-async def create_client_organization(
+def create_client_organization(
     data: dict = Body(...),
     db: Session = Depends(get_main_db)
 ):
     """
     Регистрирует клиента: создаёт ClientOrganization, создает пользователя-владельца
-    в client_users и (по флагу) создаёт клиентскую БД.
+    в client_users и создаёт клиентскую БД.
 
     Ожидаемый payload (см. index.html -> handleRegister()):
     {
@@ -99,7 +108,7 @@ async def create_client_organization(
         "login": "...",           # обязательно
         "password": "...",        # обязательно
         "company_name": "...",    # опционально
-        "create_database": true   # опционально
+        "create_database": true   # опционально; не используется — БД создаётся всегда
     }
     """
     try:
@@ -109,7 +118,6 @@ async def create_client_organization(
         login = (data.get("login") or "").strip()
         password = (data.get("password") or "").strip()
         company_name = (data.get("company_name") or "").strip()
-        create_db_flag = bool(data.get("create_database", False))
 
         # Бэкенд-валидация
         if not email:
@@ -125,40 +133,40 @@ async def create_client_organization(
         client_org = UserService.create_client_organization(
             db=db,
             company_name=company_name or contact_person,  # если нет имени компании — используем ФИО
-            notes=None
+            notes=None,
+            commit=False,
         )
 
         # 2) Создаём пользователя-владельца в основной БД (client_users)
-        UserService.create_client_user(
+        owner = UserService.create_client_user(
             db=db,
             client_organization_id=client_org.id,
             email=email,
             login=login,
             password=password,
             full_name=contact_person or login,
-            phone=phone
+            phone=phone,
+            commit=False,
         )
 
-        # 3) По флагу создаём клиентскую БД (client_{id})
-        created_db_name = None
-        if create_db_flag:
-            created_db_name = client_db_manager.create_client_database(
-                client_org, database_name=client_org.database_name or f"client_{client_org.id}"
-            )
-            client_org.database_name = created_db_name
-            db.commit()
+        # Организация и владелец — одна короткая транзакция основной БД
+        db.commit()
+
+        # 3) Клиентская БД (client_{id}) и зеркало владельца — уже без открытой
+        # транзакции основной БД; database_name сохраняется вторым коротким commit
+        created_db_name = UserService.provision_client_database(db, client_org, owner=owner)
 
         logger.info(
             f"✅ Клиент зарегистрирован: id={client_org.id}, "
             f"company='{client_org.company_name}', db='{client_org.database_name}'"
         )
 
-        return JSONResponse(
+        return ORJSONResponse(
             {
                 "success": True,
                 "message": "Клиент успешно зарегистрирован.",
                 "client_id": client_org.id,
-                "database_name": created_db_name or client_org.database_name
+                "database_name": created_db_name
             },
             status_code=201
         )
@@ -175,9 +183,9 @@ async def create_client_organization(
 # Создание БД клиента вручную (из админки)
 # ------------------------------------------------------
 @router.post("/clients/{client_id}/create-database")
-async def create_database_for_client(client_id: int, db: Session = Depends(get_main_db)):
+def create_database_for_client(client_id: int, db: Session = Depends(get_main_db)):
     """Создаёт клиентскую базу данных для существующего клиента."""
-    client = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
+    client = db.get(ClientOrganization, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Клиент не найден")
 
@@ -187,6 +195,7 @@ async def create_database_for_client(client_id: int, db: Session = Depends(get_m
         )
         client.database_name = created
         db.commit()
+        invalidate_client_org(client_id)
         return {"success": True, "message": f"База {created} успешно создана"}
     except Exception as e:
         db.rollback()
@@ -198,12 +207,13 @@ async def create_database_for_client(client_id: int, db: Session = Depends(get_m
 # Удаление клиента
 # ------------------------------------------------------
 @router.delete("/clients/{client_id}")
-async def delete_client(client_id: int, db: Session = Depends(get_main_db)):
+def delete_client(client_id: int, db: Session = Depends(get_main_db)):
     """Удаляет клиента из основной БД (ClientOrganization + каскад, если настроен)."""
-    client = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
+    client = db.get(ClientOrganization, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Клиент не найден")
 
     db.delete(client)
     db.commit()
+    invalidate_client_org(client_id)
     return {"success": True, "message": f"Клиент {client.company_name} удалён"}
@@ -76,7 +76,7 @@ async def register_page(request: Request):
 
 
 @public_router.post("/register", include_in_schema=False)
-async def register_submit(
+def register_submit(
     request: Request,
     company_name: str = Form(...),
     contact_person: str = Form(""),
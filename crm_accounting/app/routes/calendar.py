@@ -1,13 +1,12 @@
 # app/routes/calendar.py
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 import logging
 
 from app.core.database import get_main_db
 from app.utils import templates
-from app.utils.client_utils import get_client_company_settings, get_today_date
-from app.models.main_db import ClientOrganization
+from app.utils.client_utils import get_client_org_or_404, get_org_company_settings, get_today_date
 from app.managers.client_db_manager import client_db_manager
 from app.models.client_template import CalendarHandbook, Client, Report, ReportPeriod
 
@@ -16,14 +15,12 @@ router = APIRouter()
 
 
 @router.get("/client/{client_id}/calendar", response_class=HTMLResponse)
-async def client_calendar_page(
+def client_calendar_page(
     client_id: int,
     request: Request,
     db: Session = Depends(get_main_db),
 ):
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(org.database_name)
     try:
@@ -54,7 +51,7 @@ async def client_calendar_page(
     finally:
         session.close()
 
-    company_settings = get_client_company_settings(db, client_id)
+    company_settings = get_org_company_settings(org)
     client = {"id": client_id, "name": org.company_name or "Клиент"}
 
     return templates.TemplateResponse(
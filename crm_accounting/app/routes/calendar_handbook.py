@@ -1,13 +1,12 @@
 # app/routes/calendar_handbook.py
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 import logging
 
 from app.core.database import get_main_db
 from app.utils import templates
-from app.utils.client_utils import get_client_company_settings
-from app.models.main_db import ClientOrganization
+from app.utils.client_utils import get_client_org_or_404, get_org_company_settings
 from app.managers.client_db_manager import client_db_manager
 from app.models.client_template import CalendarHandbook
 
@@ -21,14 +20,12 @@ def _load_handbook(session):
 
 @router.get("/client/{client_id}/calendar_handbook", response_class=HTMLResponse)
 @router.get("/client/{client_id}/calendar-handbook", response_class=HTMLResponse)  # алиас
-async def calendar_handbook_page(
+def calendar_handbook_page(
     client_id: int,
     request: Request,
     db: Session = Depends(get_main_db),
 ):
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(org.database_name)
     try:
@@ -36,7 +33,7 @@ async def calendar_handbook_page(
     finally:
         session.close()
 
-    company_settings = get_client_company_settings(db, client_id)
+    company_settings = get_org_company_settings(org)
     client = {"id": client_id, "name": org.company_name or "Клиент"}
 
     return templates.TemplateResponse(
@@ -17,7 +17,7 @@ class ClientLogin(BaseModel):
     password: str
 
 @router.post("/client/login")
-async def client_login(login_data: ClientLogin, db: Session = Depends(get_main_db)):
+def client_login(login_data: ClientLogin, db: Session = Depends(get_main_db)):
     """Обработка входа клиента через API"""
     try:
         logger.info(f"Попытка входа с логином: {login_data.login}")
@@ -1,16 +1,17 @@
 # app/routes/client_clients.py
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from sqlalchemy.orm import Session
-from datetime import datetime
-from sqlalchemy import case
+from sqlalchemy.orm import Session, load_only, selectinload
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, insert, literal_column
+from pydantic import BaseModel
 import logging
 
 from app.core.database import get_main_db
-from app.models.main_db import ClientOrganization
 from app.managers.client_db_manager import client_db_manager
-from app.models.client_template import Client, CompanySettings, DigitalSignature
+from app.models.client_template import Client, DigitalSignature
 from app.utils import templates
+from app.utils.client_utils import get_client_org_or_404, get_org_company_settings, row_exists
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -19,11 +20,25 @@ router = APIRouter()
 # ------------------------------------------------------
 # Вспомогательные функции
 # ------------------------------------------------------
+_FALLBACK_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M")
+
+
 def _parse_date(value: str | None) -> datetime | None:
     if not value:
         return None
     value = value.strip()
-    for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M"):
+
+    # Быстрый путь по форме строки: ISO (дата или дата-время из <input type="date|datetime-local">)
+    # и ДД.ММ.ГГГГ — без перебора strptime с исключением на каждый промах.
+    try:
+        if len(value) >= 10 and value[4] == "-":
+            return datetime.fromisoformat(value)
+        if len(value) == 10 and value[2] == "." and value[5] == ".":
+            return datetime(int(value[6:]), int(value[3:5]), int(value[:2]))
+    except ValueError:
+        pass
+
+    for fmt in _FALLBACK_DATE_FORMATS:
         try:
             return datetime.strptime(value, fmt)
         except ValueError:
@@ -31,33 +46,63 @@ def _parse_date(value: str | None) -> datetime | None:
     return None
 
 
-def _get_client_org_or_404(db: Session, client_id: int) -> ClientOrganization:
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
-    return org
+class SignatureIn(BaseModel):
+    owner_name: str
+    certificate_number: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    is_active: bool = True
 
 
 # ------------------------------------------------------
 # 📄 Список клиентов
 # ------------------------------------------------------
 @router.get("/client/{client_id}/clients", response_class=HTMLResponse)
-async def client_clients_page(client_id: int, request: Request, db: Session = Depends(get_main_db)):
-    client_org = _get_client_org_or_404(db, client_id)
+def client_clients_page(client_id: int, request: Request, db: Session = Depends(get_main_db)):
+    client_org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(client_org.database_name)
     try:
-        clients = session.query(Client).order_by(Client.id.desc()).all()
-        company_settings = session.query(CompanySettings).first()
-        sig_rows = session.query(DigitalSignature).all()
-        signatures = {s.client_id: s for s in sig_rows}
-
+        # ЭЦП подгружаются одним запросом IN (...) для всех клиентов списка;
+        # из обеих таблиц берём только колонки, которые выводит clients.html
+        clients = (
+            session.query(Client)
+            .options(
+                load_only(
+                    Client.id,
+                    Client.organization_name,
+                    Client.ogrn,
+                    Client.legal_form,
+                    Client.inn,
+                    Client.tax_system,
+                    Client.is_employer,
+                ),
+                selectinload(Client.signatures).load_only(
+                    DigitalSignature.id,
+                    DigitalSignature.client_id,
+                    DigitalSignature.end_date,
+                ),
+            )
+            .order_by(Client.id.desc())
+            .all()
+        )
+        # Истекающие в ближайшие 10 дней (и уже истёкшие) ЭЦП считаем здесь —
+        # шаблону не нужна арифметика с datetime
+        threshold = datetime.utcnow() + timedelta(days=10)
         clients_with_signatures = [
-            {"client": c, "signature": signatures.get(c.id)} for c in clients
+            {
+                "client": c,
+                "signatures": c.signatures,
+                "signature": c.signatures[-1] if c.signatures else None,
+                "expiring_count": sum(1 for s in c.signatures if s.end_date and s.end_date <= threshold),
+            }
+            for c in clients
         ]
     finally:
         session.close()
 
+    company_settings = get_org_company_settings(client_org)
+
     return templates.TemplateResponse(
         "client/clients.html",
         {
@@ -74,7 +119,7 @@ async def client_clients_page(client_id: int, request: Request, db: Session = De
 # 🧾 Создание клиента
 # ------------------------------------------------------
 @router.post("/client/{client_id}/clients")
-async def create_client_for_tenant(
+def create_client_for_tenant(
     client_id: int,
     legal_form: str = Form(...),
     inn: str = Form(None),
@@ -84,7 +129,7 @@ async def create_client_for_tenant(
     is_employer: bool = Form(False),
     db: Session = Depends(get_main_db),
 ):
-    client_org = _get_client_org_or_404(db, client_id)
+    client_org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(client_org.database_name)
     try:
@@ -113,18 +158,25 @@ async def create_client_for_tenant(
 # 🪪 Карточка клиента — список ЭЦП
 # ------------------------------------------------------
 @router.get("/client/{client_id}/clients/{client_inner_id}", response_class=HTMLResponse)
-async def client_detail_page(client_id: int, client_inner_id: int, request: Request, db: Session = Depends(get_main_db)):
-    client_org = _get_client_org_or_404(db, client_id)
+def client_detail_page(client_id: int, client_inner_id: int, request: Request, db: Session = Depends(get_main_db)):
+    client_org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(client_org.database_name)
     try:
-        client_obj = session.query(Client).filter(Client.id == client_inner_id).first()
+        client_obj = session.get(Client, client_inner_id)
         if not client_obj:
             raise HTTPException(status_code=404, detail="Клиент не найден")
 
-        # ✅ Загружаем все ЭЦП клиента (списком)
+        # ✅ Загружаем все ЭЦП клиента (списком) вместе с остатком дней и признаком
+        # просрочки — считает БД, шаблону не нужна арифметика с datetime
+        now = func.sysutcdatetime()
         signatures = (
-            session.query(DigitalSignature)
+            session.query(
+                DigitalSignature,
+                func.coalesce(func.datediff(literal_column("day"), now, DigitalSignature.end_date), 9999)
+                .label("days_left"),
+                case((DigitalSignature.end_date < now, True), else_=False).label("is_expired"),
+            )
             .filter(DigitalSignature.client_id == client_inner_id)
             .order_by(
                 case((DigitalSignature.end_date.is_(None), 1), else_=0),
@@ -132,13 +184,10 @@ async def client_detail_page(client_id: int, client_inner_id: int, request: Requ
             )
             .all()
         )
-
-        company_settings = session.query(CompanySettings).first()
     finally:
         session.close()
 
-    # ✅ Добавляем текущую дату в контекст шаблона
-    today = datetime.utcnow()
+    company_settings = get_org_company_settings(client_org)
 
     return templates.TemplateResponse(
         "client/client_card.html",
@@ -147,10 +196,9 @@ async def client_detail_page(client_id: int, client_inner_id: int, request: Requ
             "client_id": client_id,
             "client_data": client_obj,
             "client_db": client_obj,
-            "signatures": signatures,  # теперь список
+            "signatures": signatures,  # строки (ЭЦП, days_left, is_expired)
             "client": client_org,
             "company_settings": company_settings,
-            "today": today,  # ✅ добавлено для шаблона
         },
     )
 
@@ -159,7 +207,7 @@ async def client_detail_page(client_id: int, client_inner_id: int, request: Requ
 # 🔏 Добавление ЭЦП
 # ------------------------------------------------------
 @router.post("/client/{client_id}/clients/{client_inner_id}/signatures")
-async def add_client_signature(
+def add_client_signature(
     client_id: int,
     client_inner_id: int,
     owner_name: str = Form(...),
@@ -169,11 +217,11 @@ async def add_client_signature(
     is_active: bool = Form(True),
     db: Session = Depends(get_main_db),
 ):
-    client_org = _get_client_org_or_404(db, client_id)
+    client_org = get_client_org_or_404(db, client_id)
     session = client_db_manager.get_client_session(client_org.database_name)
 
     try:
-        if not session.query(Client.id).filter(Client.id == client_inner_id).first():
+        if not row_exists(session, Client.id == client_inner_id):
             raise HTTPException(status_code=404, detail="Клиент не найден")
 
         ds = DigitalSignature(
@@ -194,3 +242,63 @@ async def add_client_signature(
         raise HTTPException(status_code=500, detail=f"Ошибка добавления ЭЦП: {e}")
     finally:
         session.close()
+
+
+# ------------------------------------------------------
+# 🔏 Пакетное добавление ЭЦП (импорт)
+# ------------------------------------------------------
+@router.post("/client/{client_id}/clients/{client_inner_id}/signatures/bulk")
+def add_client_signatures_bulk(
+    client_id: int,
+    client_inner_id: int,
+    payload: list[SignatureIn] = Body(...),
+    db: Session = Depends(get_main_db),
+):
+    """
+    Добавляет несколько ЭЦП клиенту одним INSERT (executemany) без ORM-объектов.
+
+    Ожидаемый payload: [{"owner_name": "...", "certificate_number": "...",
+                         "start_date": "...", "end_date": "...", "is_active": true}, ...]
+    """
+    rows = []
+    for i, item in enumerate(payload):
+        owner_name = item.owner_name.strip()
+        if not owner_name:
+            raise HTTPException(status_code=400, detail=f"Не указан владелец ЭЦП (запись {i + 1})")
+
+        dates = {}
+        for field in ("start_date", "end_date"):
+            raw = getattr(item, field)
+            dates[field] = _parse_date(raw)
+            if raw and raw.strip() and dates[field] is None:
+                raise HTTPException(status_code=400, detail=f"Неверный формат даты {field} (запись {i + 1}): {raw}")
+
+        rows.append({
+            "client_id": client_inner_id,
+            "owner_name": owner_name,
+            "certificate_number": (item.certificate_number or "").strip() or None,
+            "start_date": dates["start_date"],
+            "end_date": dates["end_date"],
+            "is_active": item.is_active,
+        })
+    if not rows:
+        return JSONResponse({"success": True, "count": 0})
+
+    client_org = get_client_org_or_404(db, client_id)
+    session = client_db_manager.get_client_session(client_org.database_name)
+    try:
+        if not row_exists(session, Client.id == client_inner_id):
+            raise HTTPException(status_code=404, detail="Клиент не найден")
+
+        session.execute(insert(DigitalSignature), rows)
+        session.commit()
+        logger.info(f"✅ Добавлено ЭЦП: {len(rows)} для клиента {client_inner_id}")
+        return JSONResponse({"success": True, "count": len(rows)}, status_code=201)
+    except HTTPException:
+        raise
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка пакетного добавления ЭЦП: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка добавления ЭЦП: {e}")
+    finally:
+        session.close()
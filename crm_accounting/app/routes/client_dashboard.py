@@ -1,17 +1,25 @@
 # app/routes/client_dashboard.py
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session, contains_eager
+from datetime import date, datetime, time, timedelta
 from calendar import monthrange
+from functools import lru_cache, partial
+import asyncio
 import logging
 
 from app.core.database import get_main_db
-from app.utils import templates
-from app.utils.client_utils import get_client_company_settings, get_today_date
-from app.models.main_db import ClientOrganization
+from app.utils import stream_template, templates
+from app.utils.client_utils import (
+    get_client_org_or_404,
+    get_org_company_settings,
+    get_today_date,
+    run_in_client_session,
+)
 from app.managers.client_db_manager import client_db_manager
-from app.models.client_template import CalendarHandbook, Client, Report, DigitalSignature
+from app.models.client_template import Client, DigitalSignature
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -20,6 +28,42 @@ router = APIRouter()
 # -------------------------------------------------------------
 # Дашборд клиента
 # -------------------------------------------------------------
+# SELECT count(*) без обёртки-подзапроса Query.count(); порог — bind-параметр,
+# поэтому выражения строятся один раз и берутся из кэша компиляции
+_CLIENTS_COUNT = select(func.count()).select_from(Client)
+_EXPIRING_SIGNATURES_COUNT = (
+    select(func.count())
+    .select_from(DigitalSignature)
+    .where(
+        DigitalSignature.end_date.isnot(None),
+        DigitalSignature.end_date <= bindparam("threshold"),
+    )
+)
+
+
+@lru_cache(maxsize=4)
+def _expiring_threshold_for(day: date) -> datetime:
+    """Порог истекающих ЭЦП: последний день месяца + 10 дней, 23:59:59."""
+    last_day = day.replace(day=monthrange(day.year, day.month)[1])
+    return datetime.combine(last_day + timedelta(days=10), time(23, 59, 59))
+
+
+def _expiring_threshold() -> datetime:
+    """
+    Порог на текущую дату (UTC). Значение меняется раз в сутки, поэтому
+    считается один раз в день и одинаково для всех запросов этого дня.
+    """
+    return _expiring_threshold_for(datetime.utcnow().date())
+
+
+def _fetch_clients_count(session):
+    return session.scalar(_CLIENTS_COUNT)
+
+
+def _fetch_expiring_count(session, threshold_end: datetime):
+    return session.scalar(_EXPIRING_SIGNATURES_COUNT, {"threshold": threshold_end})
+
+
 @router.get("/client/{client_id}/dashboard", response_class=HTMLResponse)
 async def client_dashboard(
     client_id: int,
@@ -27,44 +71,31 @@ async def client_dashboard(
     db: Session = Depends(get_main_db)
 ):
     """
-    Клиентский дашборд — показывает отчёты, календарь и количество истекающих ЭЦП.
+    Клиентский дашборд — показывает количество клиентов и истекающих ЭЦП.
+    Оба счётчика считаются параллельно, каждый в своей сессии (потоке пула).
     """
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    org = await run_in_threadpool(get_client_org_or_404, db, client_id)
+
+    threshold_end = _expiring_threshold()
 
-    session = client_db_manager.get_client_session(org.database_name)
     try:
-        reports = session.query(Report).order_by(Report.id.desc()).limit(10).all()
-        calendar = session.query(CalendarHandbook).order_by(CalendarHandbook.id.desc()).limit(10).all()
-        clients_count = session.query(Client).count()
-
-        # --- Расчет количества истекающих ЭЦП ---
-        today = datetime.utcnow()
-        last_day = monthrange(today.year, today.month)[1]
-        end_of_month = today.replace(day=last_day, hour=23, minute=59, second=59)
-        threshold_end = end_of_month + timedelta(days=10)
-
-        expiring_signatures_count = (
-            session.query(DigitalSignature)
-            .filter(DigitalSignature.end_date.isnot(None))
-            .filter(DigitalSignature.end_date <= threshold_end)
-            .count()
+        clients_count, expiring_signatures_count = await asyncio.gather(
+            run_in_threadpool(run_in_client_session, org.database_name, _fetch_clients_count),
+            run_in_threadpool(
+                run_in_client_session,
+                org.database_name,
+                partial(_fetch_expiring_count, threshold_end=threshold_end),
+            ),
         )
-
     except Exception as e:
         logger.error(f"Ошибка загрузки данных дашборда клиента {client_id}: {e}")
-        reports, calendar, clients_count, expiring_signatures_count = [], [], 0, 0
-    finally:
-        session.close()
+        clients_count, expiring_signatures_count = 0, 0
 
-    company_settings = get_client_company_settings(db, client_id)
+    company_settings = await run_in_threadpool(get_org_company_settings, org)
     client = {"id": client_id, "name": org.company_name or "Клиент"}
 
     dashboard_data = {
         "clients_count": clients_count,
-        "reports": reports,
-        "calendar": calendar,
         "today": get_today_date(),
         "expiring_signatures_count": expiring_signatures_count,
     }
@@ -85,7 +116,7 @@ async def client_dashboard(
 # Страница истекающих ЭЦП
 # -------------------------------------------------------------
 @router.get("/client/{client_id}/expiring-signatures", response_class=HTMLResponse)
-async def expiring_signatures_page(
+def expiring_signatures_page(
     client_id: int,
     request: Request,
     db: Session = Depends(get_main_db)
@@ -93,29 +124,29 @@ async def expiring_signatures_page(
     """
     Страница со списком клиентов, у которых ЭЦП истекают в текущем месяце (с учётом -10 дней).
     """
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        today = datetime.utcnow()
-        last_day = monthrange(today.year, today.month)[1]
-        end_of_month = today.replace(day=last_day, hour=23, minute=59, second=59)
-        threshold_date = end_of_month + timedelta(days=10)
-
-        signatures = (
-            session.query(DigitalSignature)
-            .join(Client, DigitalSignature.client_id == Client.id)
-            .filter(DigitalSignature.end_date.isnot(None))
-            .filter(DigitalSignature.end_date <= threshold_date)
+        threshold_date = _expiring_threshold()
+
+        # Client заполняется из того же JOIN (contains_eager) — без lazy load на каждую строку
+        stmt = (
+            select(DigitalSignature)
+            .join(DigitalSignature.client)
+            .options(contains_eager(DigitalSignature.client))
+            .where(
+                DigitalSignature.end_date.isnot(None),
+                DigitalSignature.end_date <= threshold_date,
+            )
             .order_by(DigitalSignature.end_date.asc())
-            .all()
         )
+        signatures = session.scalars(stmt).all()
 
+        today_ordinal = datetime.utcnow().toordinal()
         expiring_clients = []
         for s in signatures:
-            days_left = (s.end_date - today).days if s.end_date else None
+            days_left = s.end_date.toordinal() - today_ordinal if s.end_date else None
             expiring_clients.append({
                 "client_name": s.client.organization_name,
                 "owner_name": s.owner_name,
@@ -130,9 +161,10 @@ async def expiring_signatures_page(
         session.close()
 
     # ✅ Добавляем company_settings, чтобы избежать UndefinedError
-    company_settings = get_client_company_settings(db, client_id)
+    company_settings = get_org_company_settings(org)
 
-    return templates.TemplateResponse(
+    # Таблица может быть длинной — отдаём страницу потоком
+    return stream_template(
         "client/expiring-signatures.html",  # путь к шаблону
         {
             "request": request,
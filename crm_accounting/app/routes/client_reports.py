@@ -1,18 +1,26 @@
 # app/routes/client_reports.py
 
+import asyncio
 import logging
-from datetime import date, datetime
+from datetime import date, datetime, time
 from fastapi import APIRouter, Depends, HTTPException, Request, Form, status
-from fastapi.responses import HTMLResponse, JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from sqlalchemy import delete, exists, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.core.database import get_main_db
 from app.utils import templates
-from app.utils.client_utils import get_client_company_settings
-from app.models.main_db import ClientOrganization
+from app.utils.client_utils import (
+    clean_form_fields,
+    get_client_org_or_404,
+    get_org_company_settings,
+    row_exists,
+    run_in_client_session,
+)
 from app.managers.client_db_manager import client_db_manager
 from app.models.client_template import (
-    Client,
     ReportTemplate,
     ClientReport,
     ClientReportHistory,
@@ -20,33 +28,34 @@ from app.models.client_template import (
 )
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
-def _get_client_org_or_404(db: Session, client_id: int) -> ClientOrganization:
-    """Проверка существования клиента и его базы."""
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
-    return org
+# === Справочник шаблонов отчётов ===
+def _fetch_report_templates(session):
+    # Только поля, которые выводит reports.html
+    return session.execute(
+        select(
+            ReportTemplate.id,
+            ReportTemplate.short_name,
+            ReportTemplate.full_name,
+            ReportTemplate.description,
+        ).order_by(ReportTemplate.id.desc())
+    ).mappings().all()
 
 
-# === Справочник шаблонов отчётов ===
 @router.get("/client/{client_id}/reports", response_class=HTMLResponse)
 async def client_reports_page(
     client_id: int,
     request: Request,
     db: Session = Depends(get_main_db),
 ):
-    """Отображение списка шаблонов отчётов клиента."""
-    org = _get_client_org_or_404(db, client_id)
-    session = client_db_manager.get_client_session(org.database_name)
-    try:
-        reports = session.query(ReportTemplate).order_by(ReportTemplate.id.desc()).all()
-    finally:
-        session.close()
-
-    company_settings = get_client_company_settings(db, client_id)
+    """Отображение списка шаблонов отчётов клиента (список и шапка загружаются параллельно)."""
+    org = await run_in_threadpool(get_client_org_or_404, db, client_id)
+    reports, company_settings = await asyncio.gather(
+        run_in_threadpool(run_in_client_session, org.database_name, _fetch_report_templates),
+        run_in_threadpool(get_org_company_settings, org),
+    )
     client = {"id": client_id, "name": org.company_name or "Клиент"}
 
     return templates.TemplateResponse(
@@ -63,7 +72,7 @@ async def client_reports_page(
 
 # === Создание нового шаблона отчёта ===
 @router.post("/client/{client_id}/reports")
-async def create_report(
+def create_report(
     client_id: int,
     db: Session = Depends(get_main_db),
     full_name: str = Form(...),
@@ -71,19 +80,26 @@ async def create_report(
     description: str = Form(None),
 ):
     """Создание нового шаблона отчёта."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    values = clean_form_fields(
+        {"full_name": full_name, "short_name": short_name, "description": description},
+        required=("full_name", "short_name"),
+    )
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        new_template = ReportTemplate(
-            full_name=full_name.strip(),
-            short_name=short_name.strip(),
-            description=(description or "").strip() or None,
-            is_active=True,
-        )
+        new_template = ReportTemplate(**values, is_active=True)
         session.add(new_template)
+        # id приходит из OUTPUT inserted.id при flush; ответ собираем до commit,
+        # чтобы не перечитывать истёкший после commit объект отдельным SELECT
+        session.flush()
+        created = {
+            "id": new_template.id,
+            "full_name": new_template.full_name,
+            "short_name": new_template.short_name,
+        }
         session.commit()
-        session.refresh(new_template)
-        logger.info(f"Создан шаблон отчёта '{new_template.short_name}' для клиента {client_id}")
+        logger.info(f"Создан шаблон отчёта '{created['short_name']}' для клиента {client_id}")
     except Exception as e:
         session.rollback()
         logger.exception("Ошибка при создании шаблона отчёта")
@@ -91,43 +107,31 @@ async def create_report(
     finally:
         session.close()
 
-    return JSONResponse(
-        status_code=status.HTTP_201_CREATED,
-        content={
-            "id": new_template.id,
-            "full_name": new_template.full_name,
-            "short_name": new_template.short_name,
-        },
-    )
+    return ORJSONResponse(status_code=status.HTTP_201_CREATED, content=created)
 
 
 # === JSON: закреплённые отчёты ===
 @router.get("/client/{client_id}/assigned-reports.json")
-async def assigned_reports_json(client_id: int, db: Session = Depends(get_main_db)):
+def assigned_reports_json(client_id: int, db: Session = Depends(get_main_db)):
     """Возвращает список отчётов, закреплённых за клиентом (с периодами из client_report_history)."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        return ORJSONResponse([])
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            return JSONResponse([])
-
+        # Шаблон — JOIN в том же запросе, периоды из client_report_history — одним IN (...)
         links = (
             session.query(ClientReport)
-            .join(ReportTemplate, ClientReport.template_id == ReportTemplate.id)
-            .filter(ClientReport.client_id == inner_client.id, ClientReport.is_active == True)
+            .options(joinedload(ClientReport.template), selectinload(ClientReport.history))
+            .filter(ClientReport.client_id == inner_client_id, ClientReport.is_active == True)
             .all()
         )
 
         result = []
         for link in links:
-            # периоды берём из client_report_history
-            periods = (
-                session.query(ClientReportHistory)
-                .filter(ClientReportHistory.client_report_id == link.id)
-                .order_by(ClientReportHistory.start_date.desc())
-                .all()
-            )
+            periods = sorted(link.history, key=lambda p: p.start_date, reverse=True)
 
             result.append({
                 "id": link.id,
@@ -137,29 +141,32 @@ async def assigned_reports_json(client_id: int, db: Session = Depends(get_main_d
                 "periods": [
                     {
                         "id": p.id,
-                        "start_date": p.start_date.isoformat() if p.start_date else None,
-                        "end_date": p.end_date.isoformat() if p.end_date else None,
+                        # date отдаётся как есть — orjson сам пишет YYYY-MM-DD
+                        "start_date": p.start_date,
+                        "end_date": p.end_date,
                     }
                     for p in periods
                 ],
             })
     finally:
         session.close()
-    return JSONResponse(result)
+    return ORJSONResponse(result)
 
 
 # === JSON: доступные отчёты ===
 @router.get("/client/{client_id}/available-reports.json")
-async def available_reports_json(client_id: int, db: Session = Depends(get_main_db)):
+def available_reports_json(client_id: int, db: Session = Depends(get_main_db)):
     """Возвращает шаблоны отчётов, которые ещё не закреплены за клиентом."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        return ORJSONResponse([])
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            return JSONResponse([])
-
-        assigned = {r.template_id for r in session.query(ClientReport).filter(ClientReport.client_id == inner_client.id)}
+        # Подзапрос вместо списка id в IN (...): форма запроса не зависит от числа
+        # закреплённых отчётов и попадает в кэш компиляции SQLAlchemy
+        assigned = select(ClientReport.template_id).where(ClientReport.client_id == inner_client_id)
         available = (
             session.query(ReportTemplate)
             .filter(ReportTemplate.is_active == True)
@@ -170,39 +177,53 @@ async def available_reports_json(client_id: int, db: Session = Depends(get_main_
         data = [{"template_id": r.id, "full_name": r.full_name, "short_name": r.short_name} for r in available]
     finally:
         session.close()
-    return JSONResponse(data)
+    return ORJSONResponse(data)
 
 
 # === Добавить отчёт клиенту ===
 @router.post("/client/{client_id}/assigned-reports")
-async def assign_report(client_id: int, template_id: int = Form(...), db: Session = Depends(get_main_db)):
+def assign_report(client_id: int, template_id: int = Form(...), db: Session = Depends(get_main_db)):
     """Добавляет отчёт (шаблон) клиенту."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
-
-        tpl = session.query(ReportTemplate).filter_by(id=template_id).first()
-        if not tpl:
-            raise HTTPException(404, "Шаблон отчёта не найден")
-
-        exists = session.query(ClientReport).filter_by(client_id=inner_client.id, template_id=template_id).first()
-        if exists:
+        # Один INSERT ... SELECT ... WHERE EXISTS (шаблон) AND NOT EXISTS (связь) —
+        # аналог ON CONFLICT DO NOTHING для SQL Server. Гонку двух параллельных
+        # запросов закрывает уникальный индекс uq_client_reports_client_template.
+        result = session.execute(
+            insert(ClientReport).from_select(
+                ["client_id", "template_id", "is_active"],
+                select(literal(inner_client_id), literal(template_id), literal(True)).where(
+                    exists().where(ReportTemplate.id == template_id),
+                    ~exists().where(
+                        ClientReport.client_id == inner_client_id,
+                        ClientReport.template_id == template_id,
+                    ),
+                ),
+            )
+        )
+        if result.rowcount == 0:
+            # Ничего не вставлено: выясняем причину только в этом случае
+            session.rollback()
+            if not row_exists(session, ReportTemplate.id == template_id):
+                raise HTTPException(404, "Шаблон отчёта не найден")
             raise HTTPException(400, "Этот отчёт уже добавлен клиенту")
-
-        link = ClientReport(client_id=inner_client.id, template_id=template_id, is_active=True)
-        session.add(link)
         session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(400, "Этот отчёт уже добавлен клиенту")
     finally:
         session.close()
-    return JSONResponse({"message": "Отчёт добавлен"})
+    return ORJSONResponse({"message": "Отчёт добавлен"})
 
 
 # === Добавление периода (client_report_history) ===
 @router.post("/client/{client_id}/assigned-reports/{template_id}/periods")
-async def add_period(
+def add_period(
     client_id: int,
     template_id: int,
     start_date: str = Form(...),
@@ -210,15 +231,15 @@ async def add_period(
     db: Session = Depends(get_main_db),
 ):
     """Добавление нового периода (DATE) в client_report_history."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
-
         client_report = session.query(ClientReport).filter_by(
-            client_id=inner_client.id, template_id=template_id
+            client_id=inner_client_id, template_id=template_id
         ).first()
         if not client_report:
             raise HTTPException(404, "Связь client_report не найдена")
@@ -233,18 +254,17 @@ async def add_period(
             client_report_id=client_report.id,
             start_date=start_d,
             end_date=end_d,
-            created_at=datetime.utcnow()
         )
         session.add(new_period)
         session.commit()
     finally:
         session.close()
-    return JSONResponse({"message": "Период добавлен"})
+    return ORJSONResponse({"message": "Период добавлен"})
 
 
 # === Обновление периода (client_report_history) ===
 @router.put("/client/{client_id}/assigned-reports/history/{history_id}")
-async def update_period(
+def update_period(
     client_id: int,
     history_id: int,
     start_date: str = Form(...),
@@ -255,19 +275,19 @@ async def update_period(
     Редактирование существующего периода (client_report_history).
     Принимает start_date/end_date в формате YYYY-MM-DD. Колонки в БД — DATE.
     """
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
-
         history = (
             session.query(ClientReportHistory)
             .join(ClientReport, ClientReportHistory.client_report_id == ClientReport.id)
             .filter(
                 ClientReportHistory.id == history_id,
-                ClientReport.client_id == inner_client.id,
+                ClientReport.client_id == inner_client_id,
             )
             .first()
         )
@@ -286,59 +306,62 @@ async def update_period(
     finally:
         session.close()
 
-    return JSONResponse({"message": "Период обновлён"})
+    return ORJSONResponse({"message": "Период обновлён"})
 
 
 # === Удалить отчёт (если нет периодов) ===
 @router.delete("/client/{client_id}/assigned-reports/{template_id}")
-async def delete_report(client_id: int, template_id: int, db: Session = Depends(get_main_db)):
+def delete_report(client_id: int, template_id: int, db: Session = Depends(get_main_db)):
     """Удаляет отчёт, если у него нет периодов (в client_report_history)."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            raise HTTPException(400, "В базе клиента отсутствует запись в таблице clients")
-
-        has_periods = (
-            session.query(ClientReportHistory)
-            .join(ClientReport, ClientReportHistory.client_report_id == ClientReport.id)
-            .filter(ClientReport.template_id == template_id, ClientReport.client_id == inner_client.id)
-            .first()
+        # Один DELETE ... WHERE NOT EXISTS (периоды); причину отказа (404 или 400)
+        # выясняем отдельной проверкой только если ничего не удалено
+        result = session.execute(
+            delete(ClientReport)
+            .where(
+                ClientReport.client_id == inner_client_id,
+                ClientReport.template_id == template_id,
+                ~exists().where(ClientReportHistory.client_report_id == ClientReport.id),
+            )
+            .execution_options(synchronize_session=False)
         )
-        if has_periods:
-            raise HTTPException(400, "Нельзя удалить отчёт — есть периоды")
-
-        link = session.query(ClientReport).filter_by(client_id=inner_client.id, template_id=template_id).first()
-        if not link:
+        if result.rowcount == 0:
+            session.rollback()
+            if row_exists(session, ClientReport.client_id == inner_client_id, ClientReport.template_id == template_id):
+                raise HTTPException(400, "Нельзя удалить отчёт — есть периоды")
             raise HTTPException(404, "Отчёт не найден")
 
-        session.delete(link)
         session.commit()
     finally:
         session.close()
-    return JSONResponse({"message": "Отчёт удалён"})
+    return ORJSONResponse({"message": "Отчёт удалён"})
 
 
 # === Удаление периода (client_report_history) ===
 @router.delete("/client/{client_id}/assigned-reports/history/{history_id}")
-async def delete_period(client_id: int, history_id: int, db: Session = Depends(get_main_db)):
+def delete_period(client_id: int, history_id: int, db: Session = Depends(get_main_db)):
     """
     Удаляет конкретный период (строку в client_report_history), проверяя принадлежность текущему клиенту.
     """
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    inner_client_id = client_db_manager.inner_client_id(org.database_name)
+    if not inner_client_id:
+        raise HTTPException(status_code=400, detail="В базе клиента отсутствует запись в таблице clients")
+
     session = client_db_manager.get_client_session(org.database_name)
     try:
-        inner_client = session.query(Client).first()
-        if not inner_client:
-            raise HTTPException(status_code=400, detail="В базе клиента отсутствует запись в таблице clients")
-
         history = (
             session.query(ClientReportHistory)
             .join(ClientReport, ClientReportHistory.client_report_id == ClientReport.id)
             .filter(
                 ClientReportHistory.id == history_id,
-                ClientReport.client_id == inner_client.id
+                ClientReport.client_id == inner_client_id
             )
             .first()
         )
@@ -350,19 +373,19 @@ async def delete_period(client_id: int, history_id: int, db: Session = Depends(g
     finally:
         session.close()
 
-    return JSONResponse({"message": "Период удалён"})
+    return ORJSONResponse({"message": "Период удалён"})
 
 
 # === Детальная страница отчета ===
 @router.get("/client/{client_id}/reports/{report_id}", response_class=HTMLResponse)
-async def report_detail_page(
+def report_detail_page(
     client_id: int,
     report_id: int,
     request: Request,
     db: Session = Depends(get_main_db),
 ):
     """Детальная страница отчета."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
     session = client_db_manager.get_client_session(org.database_name)
     try:
         report = session.query(ReportTemplate).filter(ReportTemplate.id == report_id).first()
@@ -375,7 +398,7 @@ async def report_detail_page(
     finally:
         session.close()
 
-    company_settings = get_client_company_settings(db, client_id)
+    company_settings = get_org_company_settings(org)
     client = {"id": client_id, "name": org.company_name or "Клиент"}
 
     return templates.TemplateResponse(
@@ -394,7 +417,7 @@ async def report_detail_page(
 
 # === Добавление периода для отчета (в таблицу report_periods) ===
 @router.post("/client/{client_id}/reports/{report_id}/periods")
-async def add_report_period(
+def add_report_period(
     client_id: int,
     report_id: int,
     period: str = Form(...),
@@ -403,7 +426,12 @@ async def add_report_period(
     db: Session = Depends(get_main_db),
 ):
     """Добавление периода сдачи для отчета в таблицу report_periods."""
-    org = _get_client_org_or_404(db, client_id)
+    org = get_client_org_or_404(db, client_id)
+    try:
+        due = date.fromisoformat(due_date)
+    except ValueError:
+        raise HTTPException(400, "Неверный формат даты. Используйте ГГГГ-ММ-ДД")
+
     session = client_db_manager.get_client_session(org.database_name)
     
     try:
@@ -417,15 +445,16 @@ async def add_report_period(
             report_id=report_id,  # ИСПРАВЛЕНО: поле называется report_id, а не report_template_id
             period=period,
             year=year,
-            due_date=datetime.strptime(due_date, '%Y-%m-%d')  # ИСПРАВЛЕНО: поле due_date типа DateTime
+            due_date=datetime.combine(due, time.min)  # поле due_date типа DateTime
         )
         
         session.add(new_period)
         session.commit()
-        session.refresh(new_period)
-        
+
         logger.info(f"Добавлен период для отчета {report_id} клиента {client_id}")
         
+    except HTTPException:
+        raise
     except Exception as e:
         session.rollback()
         logger.exception("Ошибка при добавлении периода отчета")
@@ -433,4 +462,4 @@ async def add_report_period(
     finally:
         session.close()
 
-    return JSONResponse({"message": "Период успешно добавлен"})
\ No newline at end of file
+    return ORJSONResponse({"message": "Период успешно добавлен"})
\ No newline at end of file
@@ -1,38 +1,75 @@
 # app/routes/client_settings.py
 from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from functools import partial
+import asyncio
 import logging
 
 from app.core.database import get_main_db
 from app.utils import templates
-from app.models.main_db import ClientOrganization
+from app.utils.client_utils import (
+    clean_form_fields,
+    get_client_org_or_404,
+    run_in_client_session,
+)
 from app.managers.client_db_manager import client_db_manager
 from app.models.client_template import CompanySettings, Organization
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 # ------------------------------------------------------
 # Настройки клиента (страница)
 # ------------------------------------------------------
+def _fetch_company_settings(session):
+    return session.scalar(select(CompanySettings).limit(1))
+
+
+# Организаций на одной странице настроек; остальные догружаются через organizations.json
+_ORGANIZATIONS_PAGE_SIZE = 50
+
+
+def _fetch_organizations(session, cursor: int | None = None):
+    """
+    Страница организаций от новых к старым (keyset по id: id < cursor) и курсор
+    следующей страницы (None — страница последняя). Таблица выводит только
+    краткое имя и ИНН.
+    """
+    stmt = select(Organization.id, Organization.short_name, Organization.inn)
+    if cursor is not None:
+        stmt = stmt.where(Organization.id < cursor)
+    rows = session.execute(
+        stmt.order_by(Organization.id.desc()).limit(_ORGANIZATIONS_PAGE_SIZE + 1)
+    ).mappings().all()
+
+    if len(rows) > _ORGANIZATIONS_PAGE_SIZE:
+        rows = rows[:_ORGANIZATIONS_PAGE_SIZE]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+
 @router.get("/client/{client_id}/settings", response_class=HTMLResponse)
 async def client_settings_page(
     client_id: int,
     request: Request,
+    cursor: int | None = None,
     db: Session = Depends(get_main_db)
 ):
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    """Настройки компании и первая страница организаций — две выборки параллельно, в своих сессиях."""
+    org = await run_in_threadpool(get_client_org_or_404, db, client_id)
 
-    session = client_db_manager.get_client_session(org.database_name)
-    try:
-        company_settings = session.query(CompanySettings).first()
-        organizations = session.query(Organization).order_by(Organization.id.desc()).all()
-    finally:
-        session.close()
+    company_settings, (organizations, next_cursor) = await asyncio.gather(
+        run_in_threadpool(run_in_client_session, org.database_name, _fetch_company_settings),
+        run_in_threadpool(
+            run_in_client_session,
+            org.database_name,
+            partial(_fetch_organizations, cursor=cursor),
+        ),
+    )
 
     return templates.TemplateResponse(
         "client/settings.html",
@@ -42,15 +79,33 @@ async def client_settings_page(
             "client_id": client_id,
             "company_settings": company_settings,
             "organizations": organizations,
+            "next_cursor": next_cursor,
         },
     )
 
 
+# ------------------------------------------------------
+# Следующая страница организаций (JSON)
+# ------------------------------------------------------
+@router.get("/client/{client_id}/settings/organizations.json")
+def client_organizations_json(
+    client_id: int,
+    cursor: int | None = None,
+    db: Session = Depends(get_main_db),
+):
+    """Организации с id < cursor (по убыванию id) и курсор следующей страницы."""
+    org = get_client_org_or_404(db, client_id)
+    organizations, next_cursor = run_in_client_session(
+        org.database_name, partial(_fetch_organizations, cursor=cursor)
+    )
+    return ORJSONResponse({"items": [dict(o) for o in organizations], "next_cursor": next_cursor})
+
+
 # ------------------------------------------------------
 # ✅ Создание новой организации
 # ------------------------------------------------------
 @router.post("/client/{client_id}/settings/organizations")
-async def create_client_organization(
+def create_client_organization(
     client_id: int,
     full_name: str = Form(...),
     short_name: str = Form(...),
@@ -68,30 +123,32 @@ async def create_client_organization(
     """
     Создаёт организацию в клиентской БД.
     """
-    client_org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not client_org or not client_org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    client_org = get_client_org_or_404(db, client_id)
+    values = clean_form_fields(
+        {
+            "full_name": full_name,
+            "short_name": short_name,
+            "inn": inn,
+            "kpp": kpp,
+            "ogrn": ogrn,
+            "legal_address": legal_address,
+            "actual_address": actual_address,
+            "bank_name": bank_name,
+            "bik": bik,
+            "payment_account": payment_account,
+            "correspondent_account": correspondent_account,
+        },
+        required=("full_name", "short_name"),
+    )
 
     session = client_db_manager.get_client_session(client_org.database_name)
     try:
-        new_org = Organization(
-            full_name=full_name.strip(),
-            short_name=short_name.strip(),
-            inn=inn.strip() if inn else None,
-            kpp=kpp.strip() if kpp else None,
-            ogrn=ogrn.strip() if ogrn else None,
-            legal_address=legal_address.strip() if legal_address else None,
-            actual_address=actual_address.strip() if actual_address else None,
-            bank_name=bank_name.strip() if bank_name else None,
-            bik=bik.strip() if bik else None,
-            payment_account=payment_account.strip() if payment_account else None,
-            correspondent_account=correspondent_account.strip() if correspondent_account else None,
-        )
+        new_org = Organization(**values)
         session.add(new_org)
         session.commit()
-        logger.info(f"✅ Организация '{short_name}' создана для клиента {client_id}")
-        return JSONResponse(
-            {"success": True, "message": f"Организация '{short_name}' успешно создана"}, status_code=201
+        logger.info(f"✅ Организация '{values['short_name']}' создана для клиента {client_id}")
+        return ORJSONResponse(
+            {"success": True, "message": f"Организация '{values['short_name']}' успешно создана"}, status_code=201
         )
     except Exception as e:
         session.rollback()
@@ -105,7 +162,7 @@ async def create_client_organization(
 # Удаление организации
 # ------------------------------------------------------
 @router.delete("/client/{client_id}/settings/organizations/{org_id}")
-async def delete_client_organization(
+def delete_client_organization(
     client_id: int,
     org_id: int,
     db: Session = Depends(get_main_db),
@@ -113,9 +170,7 @@ async def delete_client_organization(
     """
     Удаляет организацию из клиентской БД.
     """
-    client_org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not client_org or not client_org.database_name:
-        raise HTTPException(status_code=404, detail="База клиента не найдена")
+    client_org = get_client_org_or_404(db, client_id)
 
     session = client_db_manager.get_client_session(client_org.database_name)
     try:
@@ -126,7 +181,7 @@ async def delete_client_organization(
         session.delete(org)
         session.commit()
         logger.info(f"❌ Организация {org_id} удалена у клиента {client_id}")
-        return JSONResponse({"success": True, "message": "Организация успешно удалена"})
+        return ORJSONResponse({"success": True, "message": "Организация успешно удалена"})
     except HTTPException:
         raise
     except Exception as e:
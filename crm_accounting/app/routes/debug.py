@@ -11,7 +11,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/client/{login}")
-async def debug_client(login: str, password: str, db: Session = Depends(get_main_db)):
+def debug_client(login: str, password: str, db: Session = Depends(get_main_db)):
     """Временный маршрут для диагностики входа клиента"""
     try:
         logger.info(f"Диагностика входа для логина: {login}")
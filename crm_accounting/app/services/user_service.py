@@ -18,25 +18,56 @@ class UserService:
     # 1️⃣ Создание клиентской организации + автосоздание БД
     # ---------------------------------------------------------
     @staticmethod
-    def create_client_organization(db: Session, company_name: str, notes: str | None = None) -> ClientOrganization:
+    def create_client_organization(
+        db: Session,
+        company_name: str,
+        notes: str | None = None,
+        commit: bool = True,
+    ) -> ClientOrganization:
+        """
+        Создаёт ClientOrganization и клиентскую БД client_{id}.
+        При commit=False запись только сбрасывается в БД (flush), а клиентская БД
+        не создаётся: вызывающий фиксирует основную транзакцию сам и затем вызывает
+        provision_client_database — CREATE DATABASE не должен идти при открытой
+        транзакции основной БД.
+        """
         try:
             client = ClientOrganization(company_name=company_name, notes=notes, is_active=True)
             db.add(client)
+            if not commit:
+                db.flush()  # нужен client.id
+                return client
+
             db.commit()
             db.refresh(client)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ошибка создания клиентской организации: {e}")
+            raise
+
+        UserService.provision_client_database(db, client)
+        return client
 
-            # Автоматическое создание клиентской БД
+    @staticmethod
+    def provision_client_database(db: Session, client: ClientOrganization, owner: ClientUser | None = None) -> str:
+        """
+        Создаёт клиентскую БД client_{id} (отдельное соединение к master), при передаче
+        owner зеркалирует его в клиентскую БД и только после этого короткой транзакцией
+        сохраняет database_name. Запись организации к этому моменту уже зафиксирована.
+        """
+        try:
             db_name = f"client_{client.id}"
             created_name = client_db_manager.create_client_database(client, database_name=db_name)
+            if owner is not None:
+                UserService.mirror_client_user(created_name, owner)
+
             client.database_name = created_name
             db.commit()
-            db.refresh(client)
-
             logger.info(f"Клиентская БД создана автоматически: {created_name}")
-            return client
+            return created_name
         except Exception as e:
             db.rollback()
-            logger.error(f"Ошибка создания клиентской организации/БД: {e}")
+            logger.error(f"Ошибка создания клиентской БД для организации {client.id}: {e}")
             raise
 
     # ---------------------------------------------------------
@@ -50,11 +81,14 @@ class UserService:
         login: str,
         password: str,
         full_name: str,
-        phone: str | None = None
+        phone: str | None = None,
+        commit: bool = True,
     ):
         """
         Создаёт пользователя клиента в основной БД и дублирует его в клиентской БД.
         Назначает профиль "Владелец", если это первый пользователь клиента.
+        При commit=False основная БД только получает flush, commit делает вызывающий,
+        а зеркалирование в клиентскую БД выполняет provision_client_database.
         """
         try:
             owner_profile = (
@@ -65,8 +99,7 @@ class UserService:
             if not owner_profile:
                 owner_profile = UserProfile(name="Владелец", description="Профиль владельца клиента")
                 db.add(owner_profile)
-                db.commit()
-                db.refresh(owner_profile)
+                db.flush()
 
             hashed = get_password_hash(password)
             user = ClientUser(
@@ -80,27 +113,17 @@ class UserService:
                 is_active=True,
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            db.flush()  # нужен user.id для main_user_id в клиентской БД
+            if not commit:
+                return user
 
-            client_org = db.query(ClientOrganization).filter(ClientOrganization.id == client_organization_id).first()
+            client_org = db.get(ClientOrganization, client_organization_id)
             if not client_org or not client_org.database_name:
                 raise ValueError("Не найдена клиентская БД для зеркалирования пользователя")
 
-            session = client_db_manager.get_client_session(client_org.database_name)
-            try:
-                tpl_user = ClientUserTemplate(
-                    main_user_id=user.id,
-                    full_name=full_name,
-                    email=email,
-                    login=login,
-                    hashed_password=user.hashed_password,
-                    is_active=True,
-                )
-                session.add(tpl_user)
-                session.commit()
-            finally:
-                session.close()
+            UserService.mirror_client_user(client_org.database_name, user)
+            db.commit()
+            db.refresh(user)
 
             logger.info(f"Пользователь {login} создан успешно (организация ID={client_organization_id})")
             return user
@@ -110,6 +133,25 @@ class UserService:
             logger.error(f"Ошибка создания пользователя клиента: {e}")
             raise
 
+    @staticmethod
+    def mirror_client_user(database_name: str, user: ClientUser) -> None:
+        """Дублирует пользователя основной БД в таблицу client_users клиентской БД."""
+        session = client_db_manager.get_client_session(database_name)
+        try:
+            session.add(
+                ClientUserTemplate(
+                    main_user_id=user.id,
+                    full_name=user.full_name,
+                    email=user.email,
+                    login=user.login,
+                    hashed_password=user.hashed_password,
+                    is_active=True,
+                )
+            )
+            session.commit()
+        finally:
+            session.close()
+
     # ---------------------------------------------------------
     # 3️⃣ Аутентификация пользователя клиента (вход)
     # ---------------------------------------------------------
@@ -1,14 +1,55 @@
 # app/utils/__init__.py
 
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+import logging
 import os
 
+from app.core.config import settings
+
 # Определяем абсолютный путь до папки с шаблонами
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
-# Инициализируем шаблонизатор
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# Инициализируем шаблонизатор. Вне DEBUG шаблоны не проверяются на изменение
+# при каждом рендере, а скомпилированный код переживает перезапуск процесса
+templates = Jinja2Templates(
+    directory=TEMPLATES_DIR,
+    auto_reload=settings.DEBUG,
+    cache_size=400,
+    bytecode_cache=FileSystemBytecodeCache(),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def stream_template(name: str, context: dict) -> StreamingResponse:
+    """
+    Отдаёт HTML по мере рендера (Jinja template.stream) — только для страниц
+    с действительно длинными таблицами: рендер идёт параллельно с передачей,
+    и страница целиком не собирается в памяти. За GZipMiddleware байты уходят
+    по мере заполнения буфера zlib, а не сразу, поэтому на коротких страницах
+    выигрыша нет — там остаётся TemplateResponse.
+    context, как и в TemplateResponse, должен содержать request.
+
+    Заголовки к моменту рендера уже отправлены: ошибка в шаблоне обрывает
+    ответ (клиент получает недогруженную страницу со статусом 200), поэтому
+    она обязательно логируется.
+    """
+    stream = templates.get_template(name).stream(context)
+    # Копим фрагменты вывода, чтобы не отправлять (и не сжимать) каждый отдельно
+    stream.enable_buffering(size=64)
+
+    def body():
+        try:
+            yield from stream
+        except Exception:
+            logger.exception(f"Ошибка рендера шаблона {name} во время отправки ответа")
+            raise
+
+    return StreamingResponse(body(), media_type="text/html")
+
 
 # Чтобы другие утилиты могли использовать объект templates напрямую:
-__all__ = ["templates"]
+__all__ = ["templates", "stream_template"]
@@ -1,6 +1,10 @@
 # app/utils/client_utils.py
 import logging
+import threading
 from types import SimpleNamespace
+from cachetools import TTLCache
+from fastapi import HTTPException
+from sqlalchemy import case, exists, select
 from sqlalchemy.orm import Session
 from datetime import datetime
 
@@ -10,36 +14,116 @@ from app.models.client_template import CompanySettings
 
 logger = logging.getLogger(__name__)
 
+# Кэш ClientOrganization и настроек компании (шапка портала): обе записи нужны
+# на каждой странице клиента, а меняются редко. Храним только нужные поля,
+# а не ORM-объекты, чтобы не держать detached-экземпляры.
+_org_cache: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_company_settings_cache: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_org_cache_lock = threading.Lock()
 
-def get_client_company_settings(db: Session, client_id: int) -> SimpleNamespace:
+_DEFAULT_COMPANY_NAME = "Моя компания"
+
+
+def get_client_org_or_404(db: Session, client_id: int) -> SimpleNamespace:
+    """
+    Возвращает (id, database_name, company_name) организации клиента или 404,
+    если организации или её БД нет.
+    """
+    with _org_cache_lock:
+        org = _org_cache.get(client_id)
+    if org is not None:
+        return org
+
+    row = db.get(ClientOrganization, client_id)
+    if not row or not row.database_name:
+        raise HTTPException(status_code=404, detail="База клиента не найдена")
+
+    org = SimpleNamespace(id=row.id, database_name=row.database_name, company_name=row.company_name)
+    with _org_cache_lock:
+        _org_cache[client_id] = org
+    return org
+
+
+def invalidate_client_org(client_id: int) -> None:
+    """
+    Сбрасывает кэш организации и её настроек компании
+    (удаление клиента, создание БД).
+    """
+    with _org_cache_lock:
+        _org_cache.pop(client_id, None)
+        _company_settings_cache.pop(client_id, None)
+
+
+def run_in_client_session(database_name: str, fetch):
+    """
+    Выполняет fetch(session) в отдельной сессии клиентской БД и закрывает её.
+    Удобно для параллельных выборок через run_in_threadpool + asyncio.gather:
+    у каждой выборки своя сессия и своё соединение из пула.
+    """
+    session = client_db_manager.get_client_session(database_name)
+    try:
+        return fetch(session)
+    finally:
+        session.close()
+
+
+def get_org_company_settings(org: SimpleNamespace) -> SimpleNamespace:
     """
-    Возвращает объект с полями company_name и logo для шапки клиентского портала.
-    Гарантирует наличие полей, даже если запись в клиентской БД отсутствует.
+    Возвращает объект с полями company_name и logo для шапки клиентского портала
+    по уже найденной организации (результат get_client_org_or_404) — без обращения
+    к основной БД. Гарантирует наличие полей, даже если запись в клиентской БД отсутствует.
     """
-    org = db.query(ClientOrganization).filter(ClientOrganization.id == client_id).first()
-    if not org or not org.database_name:
-        return SimpleNamespace(company_name="Моя компания", logo=None)
+    with _org_cache_lock:
+        cached = _company_settings_cache.get(org.id)
+    if cached is not None:
+        return cached
 
     session = client_db_manager.get_client_session(org.database_name)
     try:
         cs = session.query(CompanySettings).first()
         if not cs:
-            cs = CompanySettings(company_name=org.company_name or "Моя компания")
+            cs = CompanySettings(company_name=org.company_name or _DEFAULT_COMPANY_NAME)
             session.add(cs)
             session.commit()
             session.refresh(cs)
 
-        company_name = getattr(cs, "company_name", None) or "Моя компания"
+        company_name = getattr(cs, "company_name", None) or _DEFAULT_COMPANY_NAME
         logo = getattr(cs, "logo", None) if hasattr(cs, "logo") else None
 
-        return SimpleNamespace(company_name=company_name, logo=logo)
+        result = SimpleNamespace(company_name=company_name, logo=logo)
 
     except Exception as e:
-        logger.error(f"Ошибка получения настроек компании для клиента {client_id}: {e}")
-        return SimpleNamespace(company_name="Моя компания", logo=None)
+        logger.error(f"Ошибка получения настроек компании для клиента {org.id}: {e}")
+        # Значение по умолчанию не кэшируем — ошибка может быть временной
+        return SimpleNamespace(company_name=_DEFAULT_COMPANY_NAME, logo=None)
     finally:
         session.close()
 
+    with _org_cache_lock:
+        _company_settings_cache[org.id] = result
+    return result
+
+
+def row_exists(session: Session, *criteria) -> bool:
+    """
+    Проверка существования строки без загрузки объекта.
+    SQL Server не допускает EXISTS в списке SELECT, поэтому запрос
+    строится как SELECT CASE WHEN EXISTS (...) THEN 1 ELSE 0 END.
+    """
+    return bool(session.scalar(select(case((exists().where(*criteria), True), else_=False))))
+
+
+def clean_form_fields(fields: dict, required: tuple = ()) -> dict:
+    """
+    Нормализует поля формы за один проход: у строк обрезаются пробелы,
+    пустые строки становятся None. Если обязательное поле пустое — 400.
+    """
+    values = {k: (v.strip() or None) if isinstance(v, str) else v for k, v in fields.items()}
+    missing = [k for k in required if values.get(k) is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Не заполнены обязательные поля: {', '.join(missing)}")
+    return values
+
 
 def get_today_date() -> str:
     """